@@ -0,0 +1,376 @@
+"""
+Shared helpers for the PDF table extraction scripts.
+
+Provides downloading (with an on-disk cache), parsing of page specifications,
+and extraction of tables from a PDF into a single CSV file. The CLI scripts in
+this directory are thin wrappers around these functions.
+"""
+
+import hashlib
+import importlib.util
+import shutil
+import sys
+import tempfile
+import time
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from _pdf_settings import (
+    BACKENDS,
+    BACKEND_PACKAGES,
+    CACHE_DIR,
+    CACHE_TTL_SECONDS,
+    DOWNLOAD_CHUNK_SIZE,
+    EXIT_EXTRACT_ERROR,
+    EXIT_WRITE_ERROR,
+    PAGES_PATTERN,
+)
+
+try:
+    import requests
+    import numpy as np
+    import pandas as pd
+    from pandas.api.types import is_object_dtype, is_string_dtype
+    DEPENDENCIES_AVAILABLE = True
+except ImportError as e:
+    DEPENDENCIES_AVAILABLE = False
+    print(f"Warning: Missing dependencies: {e}")
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+def download_pdf(url, temp_dir):
+    """Download PDF from URL to temporary directory."""
+    try:
+        pdf_path = os.path.join(temp_dir, "temp_pdf.pdf")
+        # Stream the body to disk so memory use does not grow with the PDF size
+        with requests.get(url, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            # Let urllib3 undo any Content-Encoding (gzip etc.) while copying from the raw stream
+            response.raw.decode_content = True
+            with open(pdf_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK_SIZE)
+        
+        return pdf_path
+    except Exception as e:
+        print(f"Error downloading PDF: {e}")
+        sys.exit(1)
+
+
+def cached_download_pdf(url, cache_dir=CACHE_DIR, ttl=CACHE_TTL_SECONDS):
+    """Return a cached copy of the PDF at `url`, downloading it first if it is missing or older than `ttl` seconds."""
+    cache_dir = Path(cache_dir)
+    cache_path = cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()}.pdf"
+
+    if cache_path.is_file() and time.time() - cache_path.stat().st_mtime < ttl:
+        print(f"Using cached PDF: {cache_path}")
+        return str(cache_path)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Download next to the cache entry, then rename so readers never see a partial file
+    with tempfile.TemporaryDirectory(dir=cache_dir) as temp_dir:
+        pdf_path = download_pdf(url, temp_dir)
+        os.replace(pdf_path, cache_path)
+
+    return str(cache_path)
+
+
+def _normalize_header_values(values: List[object]) -> List[str]:
+    """Convert potential header cell values to clean strings, replacing None/NaN with empty strings."""
+    out = []
+    for v in values:
+        s = "" if v is None else str(v)
+        s = s.strip()
+        if s.lower() in ("nan", "none"):
+            s = ""
+        out.append(s)
+    return out
+
+
+def _normalize_headers(headers: "pd.DataFrame") -> List[List[str]]:
+    """Normalize each header row in a single pass over the raw cell values (header slices are only a few rows)."""
+    return [_normalize_header_values(row) for row in headers.to_numpy(dtype=object)]
+
+
+def _flatten_labels(arrays: List[List[str]], sep: str) -> List[str]:
+    """Join the non-empty header parts of each column with `sep`, using col_<i> for columns without any."""
+    cols = np.array(arrays, dtype=object).T  # shape (ncols, header_rows)
+    return [sep.join([p for p in col if p]) or f"col_{i}" for i, col in enumerate(cols)]
+
+
+def _apply_multirow_header(df: "pd.DataFrame", header_rows: int, flatten: bool, sep: str) -> "pd.DataFrame":
+    """
+    Use the first `header_rows` rows of df as column headers.
+    - If flatten=False: create a MultiIndex header.
+    - If flatten=True: join header levels into a single level using `sep`.
+    Returns a new DataFrame with those header rows removed from the data.
+    """
+    if header_rows <= 0:
+        return df
+
+    if len(df) < header_rows:
+        # Not enough rows to form headers; return as-is
+        return df
+
+    headers = df.iloc[:header_rows]
+
+    # Clean NaNs/None and build column labels from header rows
+    arrays = _normalize_headers(headers)
+
+    # Ensure all arrays are the same length as number of columns in the data slice
+    ncols = df.shape[1]
+    arrays = [arr + [""] * (ncols - len(arr)) if len(arr) < ncols else arr[:ncols] for arr in arrays]
+
+    data = df.iloc[header_rows:].reset_index(drop=True)
+
+    if header_rows == 1:
+        # Common case: a single header row needs no MultiIndex
+        data.columns = _flatten_labels(arrays, sep) if flatten else arrays[0]
+        return data
+
+    if flatten:
+        # Join non-empty parts for each column
+        data.columns = _flatten_labels(arrays, sep)
+    else:
+        # Create a MultiIndex from header arrays; levels are pre-cast so pandas skips dtype inference
+        try:
+            levels = [pd.Index(arr, dtype="string") for arr in arrays]
+            data.columns = pd.MultiIndex.from_arrays(levels, names=[None] * header_rows)
+        except Exception:
+            # Fallback: flatten if MultiIndex creation fails
+            data.columns = _flatten_labels(arrays, sep)
+
+    return data
+
+
+def _to_numeric_or_self(col: "pd.Series") -> "pd.Series":
+    """
+    Return `col` converted to a nullable numeric dtype, or unchanged if any value is not a number
+    or would be written differently after conversion (e.g. "007", "1e3", "2.50").
+    """
+    try:
+        converted = pd.to_numeric(col, downcast="integer", dtype_backend="numpy_nullable")
+    except (ValueError, TypeError):
+        return col
+    original = col.astype("string").fillna("")
+    roundtrip = converted.astype("string").fillna("")
+    return converted if original.equals(roundtrip) else col
+
+
+def _shrink_dtypes(df: "pd.DataFrame") -> "pd.DataFrame":
+    """Convert text columns that hold only numbers to numeric dtypes, so to_csv can format them in bulk."""
+    return df.apply(lambda c: _to_numeric_or_self(c) if is_object_dtype(c) or is_string_dtype(c) else c)
+
+
+def _arrow_column(col: "pd.Series") -> "pa.Array":
+    """Convert a column to an Arrow array, writing mixed-type object columns as text."""
+    try:
+        return pa.array(col, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(col.astype("string"), from_pandas=True)
+
+
+def _write_csv(df: "pd.DataFrame", fh, header: bool, engine: str = "pandas") -> None:
+    """
+    Append `df` to the binary file handle `fh` as CSV using the given engine.
+    - "pandas": DataFrame.to_csv; MultiIndex headers are written as one CSV row per level.
+    - "pyarrow": Arrow's C++ CSV writer. Faster, but the text differs from pandas (strings are
+      always quoted, 1.0 is written as 1, True as true) and MultiIndex headers are not supported.
+    The engine is chosen once per output file so a file never mixes both styles.
+    """
+    if engine == "pyarrow":
+        if isinstance(df.columns, pd.MultiIndex):
+            raise ValueError("the pyarrow CSV engine cannot write multi-row headers; use --flatten-headers")
+        arrays = [_arrow_column(df.iloc[:, i]) for i in range(df.shape[1])]
+        # from_arrays keeps duplicate column names, which Table.from_pandas rejects
+        tbl = pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+        pacsv.write_csv(tbl, fh, write_options=pacsv.WriteOptions(include_header=header))
+        return
+
+    df.to_csv(fh, mode="wb", header=header, index=False)
+
+
+def parse_pages(pages) -> str:
+    """
+    Validate the pages argument and return it in compact form: "all" or e.g. "1-3,5,7-9".
+    Ranges are not expanded, so tabula receives a single string instead of a list of ints.
+    """
+    spec = "".join(str(pages).split())
+    if spec.lower() == "all":
+        return "all"
+    if not PAGES_PATTERN.match(spec):
+        raise ValueError(f"Invalid pages specification: '{pages}' (expected e.g. 'all', '1', '1-3', '1,3,5')")
+    for page_spec in spec.split(","):
+        start, _, end = page_spec.partition("-")
+        if int(start) < 1:
+            raise ValueError(f"Invalid pages specification: '{pages}' (page numbers start at 1)")
+        if end and int(start) > int(end):
+            raise ValueError(f"Invalid pages specification: '{pages}' (range '{page_spec}' is reversed)")
+    return spec
+
+
+def _expand_pages(pages_list: str, page_count: int) -> List[int]:
+    """Expand a compact pages specification into a list of 1-based page numbers."""
+    if pages_list == "all":
+        return list(range(1, page_count + 1))
+    numbers = []
+    for page_spec in pages_list.split(","):
+        if "-" in page_spec:
+            start, end = map(int, page_spec.split("-"))
+            numbers.extend(range(start, end + 1))
+        else:
+            numbers.append(int(page_spec))
+    if max(numbers) > page_count:
+        raise ValueError(f"Page {max(numbers)} is out of range: the PDF has {page_count} page(s)")
+    return numbers
+
+
+def missing_backend_package(backend) -> Optional[str]:
+    """Return the pip package to install if `backend` cannot be imported, else None. Does not import it."""
+    module, package = BACKEND_PACKAGES[backend]
+    return package if importlib.util.find_spec(module) is None else None
+
+
+def _read_tables_tabula(pdf_path, pages_list) -> List["pd.DataFrame"]:
+    """Read tables with tabula-py. Imported lazily since it starts a JVM."""
+    import tabula
+
+    return tabula.read_pdf(pdf_path, pages=pages_list, multiple_tables=True)
+
+
+def _read_tables_pymupdf(pdf_path, pages_list) -> List["pd.DataFrame"]:
+    """Read tables with PyMuPDF's page.find_tables()."""
+    import pymupdf
+
+    tables = []
+    with pymupdf.open(pdf_path) as doc:
+        for page_no in _expand_pages(pages_list, doc.page_count):
+            page = doc[page_no - 1]
+            tables.extend(t.to_pandas() for t in page.find_tables().tables)
+    return tables
+
+
+def _read_tables_pdfplumber(pdf_path, pages_list) -> List["pd.DataFrame"]:
+    """Read tables with pdfplumber, using the first row of each table as column names (as tabula does)."""
+    import pdfplumber
+
+    tables = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in (pdf.pages[n - 1] for n in _expand_pages(pages_list, len(pdf.pages))):
+            for rows in page.extract_tables():
+                if rows:
+                    tables.append(pd.DataFrame(rows[1:], columns=rows[0]))
+    return tables
+
+
+_TABLE_READERS = {
+    "pymupdf": _read_tables_pymupdf,
+    "pdfplumber": _read_tables_pdfplumber,
+    "tabula": _read_tables_tabula,
+}
+
+
+def _column_keys(columns: "pd.Index") -> List[tuple]:
+    """Key each column label by (label, n-th occurrence) so duplicate labels can be matched up."""
+    seen = {}
+    keys = []
+    for label in columns:
+        n = seen.get(label, 0)
+        seen[label] = n + 1
+        keys.append((label, n))
+    return keys
+
+
+def _union_columns(tables: List["pd.DataFrame"]) -> List[tuple]:
+    """
+    Return the column keys of all tables in order of first appearance (pd.concat(sort=False) order).
+    Unlike pd.concat, duplicate labels (e.g. several blank headers) are allowed.
+    """
+    union = {}
+    for df in tables:
+        union.update(dict.fromkeys(_column_keys(df.columns)))
+    return list(union)
+
+
+def _align_columns(df: "pd.DataFrame", columns: List[tuple]) -> "pd.DataFrame":
+    """Reorder `df` to the given column keys by name, adding empty columns for labels it lacks."""
+    keys = _column_keys(df.columns)
+    if keys == columns:
+        return df
+    position = {key: i for i, key in enumerate(keys)}
+    indexer = [position.get(key, -1) for key in columns]
+    aligned = df.set_axis(range(df.shape[1]), axis=1).reindex(columns=indexer)
+    return aligned.set_axis(pd.Index([label for label, _ in columns]), axis=1)
+
+
+def extract_and_write(pdf_path, pages, output_csv, header_rows=0, flatten_headers=False, header_sep=" | ", backend="pymupdf", shrink_dtypes=False, csv_engine="pandas"):
+    """
+    Extract tables from PDF pages and save to CSV.
+    Exits with EXIT_EXTRACT_ERROR if the backend fails to read the PDF and with
+    EXIT_WRITE_ERROR if the CSV cannot be written; other errors propagate.
+    """
+    # Parse pages parameter: "all", page ranges like "1-3" or individual pages like "1,3,5"
+    try:
+        pages_list = parse_pages(pages)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Extracting tables from pages: {pages_list}")
+
+    # Extract tables using the selected backend
+    try:
+        read_tables = _TABLE_READERS[backend]
+    except KeyError:
+        print(f"Error: Unknown backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+        sys.exit(1)
+    try:
+        tables = read_tables(pdf_path, pages_list)
+    except Exception as e:
+        print(f"Error extracting tables: {e}")
+        sys.exit(EXIT_EXTRACT_ERROR)
+
+    if not tables:
+        print("No tables found in the specified pages.")
+        sys.exit(1)
+
+    def process(idx, df):
+        if header_rows and header_rows > 0:
+            print(f"Applying {header_rows} header row(s) to table {idx} (flatten={flatten_headers})")
+            df = _apply_multirow_header(df, header_rows, flatten_headers, header_sep)
+        if shrink_dtypes:
+            df = _shrink_dtypes(df)
+        return df
+
+    processed = [process(idx, df) for idx, df in enumerate(tables, start=1)]
+
+    # Align every table to the union of all column labels, as pd.concat did, so each CSV row
+    # has the header's fields
+    columns = _union_columns(processed)
+
+    try:
+        csv_fh = open(output_csv, "wb")
+    except OSError as e:
+        print(f"Error writing CSV: {e}")
+        sys.exit(EXIT_WRITE_ERROR)
+
+    # Tables are written one at a time instead of being concatenated into one frame
+    # (pandas will output multiple header rows if MultiIndex columns are used and flatten_headers=False)
+    total_rows = 0
+    with csv_fh:
+        for idx, df in enumerate(processed, start=1):
+            df = _align_columns(df, columns)
+            try:
+                _write_csv(df, csv_fh, header=(idx == 1), engine=csv_engine)
+            except Exception as e:
+                print(f"Error writing CSV: {e}")
+                sys.exit(EXIT_WRITE_ERROR)
+            total_rows += len(df)
+
+    print(f"Tables extracted and saved to: {output_csv}")
+    print(f"Total rows extracted: {total_rows}")
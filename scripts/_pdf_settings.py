@@ -0,0 +1,25 @@
+"""
+Constants shared by the PDF table extraction scripts.
+
+Kept free of third-party imports so the CLI can build its argument parser
+(and answer --help) without loading pandas, numpy or requests.
+"""
+
+import os
+import re
+from pathlib import Path
+
+BACKENDS = ("pymupdf", "pdfplumber", "tabula")
+# Backend -> (importable module, pip package)
+BACKEND_PACKAGES = {
+    "pymupdf": ("pymupdf", "pymupdf"),
+    "pdfplumber": ("pdfplumber", "pdfplumber"),
+    "tabula": ("tabula", "tabula-py"),
+}
+CSV_ENGINES = ("pandas", "pyarrow")
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+PAGES_PATTERN = re.compile(r"^(\d+(-\d+)?)(,\d+(-\d+)?)*$")
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "extract_table"
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+EXIT_EXTRACT_ERROR = 2
+EXIT_WRITE_ERROR = 3